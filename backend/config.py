@@ -47,4 +47,24 @@ MEDIA_DIR = "media"
 
 # Other configurations
 MAX_SCENES = 3
-CHUNK_SIZE = 25 * 1024 * 1024  # 25 MB for audio chunks
\ No newline at end of file
+CHUNK_SIZE = 25 * 1024 * 1024  # 25 MB for audio chunks
+
+# Speech detection (Silero VAD)
+VAD_SAMPLE_RATE = 16000
+VAD_WINDOW_SIZE = 512  # samples per model step at 16 kHz
+VAD_MAX_BATCH_SIZE = 32  # max number of segments run through the model at once
+VAD_SEGMENT_S = 10.0  # longer clips are cut into segments of this length before batching
+VAD_MAX_WAIT_MS = 5  # how long to wait for concurrent requests before running a batch
+VAD_RESULT_TIMEOUT_S = 120  # how long a caller waits for its results before giving up
+# CPUs this process may actually run on (affinity / cpuset), not the host's total
+VAD_NUM_THREADS = int(os.getenv(
+    "VAD_NUM_THREADS",
+    len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1,
+))
+
+# Speech probe: scan audio window by window and stop at the first confident speech
+VAD_PROBE_MODE = True
+VAD_PROBE_WINDOW_S = 5.0  # seconds of audio decoded per step
+VAD_PROBE_MIN_SPEECH_S = 0.5  # a segment at least this long counts as confident speech
+VAD_PROBE_FULL_SCAN_S = 60.0  # videos up to this long are scanned end to end
+VAD_PROBE_COVERAGE = 0.25  # fraction of longer videos sampled, spread evenly
\ No newline at end of file
@@ -4,8 +4,7 @@ import cv2
 import moviepy.editor as mp
 import numpy as np
 import os
-import torch
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import aiohttp
 from scipy.signal import find_peaks
 from scipy.io import wavfile
@@ -16,7 +15,14 @@ from suno import Suno, ModelVersions
 from openai import AsyncOpenAI
 
 from models import KeyframeAnalysis
-from config import OPEN_AI_KEY, KEYFRAME_PROMPT, SUNO_PROMPT_TEMPLATE
+from config import (
+    OPEN_AI_KEY,
+    KEYFRAME_PROMPT,
+    SUNO_PROMPT_TEMPLATE,
+    VAD_SAMPLE_RATE,
+    VAD_PROBE_MODE,
+)
+from vad import probe_audio, vad_batcher
 
 
 # Clients
@@ -24,27 +30,59 @@ client = AsyncOpenAI(api_key=OPEN_AI_KEY)
 
 
 # Speech detection
-def has_speech(video_id: str) -> bool:
+def probe_speech(video_id: str) -> Tuple[List[dict], float]:
+    """Early-exit speech scan of the video's audio track (see vad.probe_audio).
+
+    Falls back to a full scan if the probe fails before scanning anything.
+    """
+    video_path = f"media/{video_id}/{video_id}.mp4"
+    audio = None
+    try:
+        audio = mp.AudioFileClip(video_path, fps=VAD_SAMPLE_RATE)
+        return probe_audio(audio)
+
+    except Exception as e:
+        print(f"Error in speech probe: {str(e)}. Falling back to a full scan")
+
+    finally:
+        if audio is not None:
+            audio.close()
+
+    return detect_speech(video_id, probe=False)
+
+def detect_speech(video_id: str, probe: bool = VAD_PROBE_MODE) -> Tuple[List[dict], float]:
+    """Return speech timestamps ([{start, end}] in seconds) and the fraction of the audio scanned.
+
+    A coverage below 1.0 means the probe stopped early or sampled the audio, so the
+    timestamps are not the full list.
+    """
+    if probe:
+        return probe_speech(video_id)
+
     video_path = f"media/{video_id}/{video_id}.mp4"
     try:
         video = mp.VideoFileClip(video_path)
         audio_path = f"media/{video_id}/{video_id}.wav"
-        video.audio.write_audiofile(audio_path, codec='pcm_s16le')
+        video.audio.write_audiofile(audio_path, fps=VAD_SAMPLE_RATE, codec='pcm_s16le')
         video.close()
 
-        model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad', model='silero_vad')
-        (get_speech_timestamps, _, read_audio, _, _) = utils
-
-        wav = read_audio(audio_path, sampling_rate=16000)
-        speech_timestamps = get_speech_timestamps(wav, model, sampling_rate=16000)
-
+        _, samples = wavfile.read(audio_path)
         os.remove(audio_path)
 
-        return len(speech_timestamps) > 0
+        # Convert to mono float in [-1, 1]
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        wav = samples.astype(np.float32) / 32768
+
+        return vad_batcher.get_speech_timestamps(wav), 1.0
 
     except Exception as e:
         print(f"Error in speech detection: {str(e)}")
-        return False
+        return [], 0.0
+
+def has_speech(video_id: str, probe: bool = VAD_PROBE_MODE) -> bool:
+    speech_timestamps, _ = detect_speech(video_id, probe)
+    return len(speech_timestamps) > 0
 
 # Audio extraction
 def extract_audio(video_id: str) -> str:
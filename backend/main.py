@@ -8,7 +8,7 @@ import time
 
 from models import VideoIdRequest, VideoProcessingResponse, GenerateRequest, GenerateResponse, VideoPostProcessRequest, VideoPostProcessResponse
 from helper import (
-    has_speech,
+    detect_speech,
     transcribe_audio,
     extract_keyframes,
     generate_keyframe_desc,
@@ -61,7 +61,8 @@ async def process_video(request: VideoIdRequest):
     start_time = time.time()
     
     try:
-        has_speech_result = await asyncio.to_thread(has_speech, video_id)
+        speech_timestamps, speech_scan_coverage = await asyncio.to_thread(detect_speech, video_id)
+        has_speech_result = len(speech_timestamps) > 0
         
         transcription = None
         if has_speech_result:
@@ -80,6 +81,8 @@ async def process_video(request: VideoIdRequest):
         response = VideoProcessingResponse(
             message=f"Video processing completed in {processing_time:.2f} seconds",
             has_speech=has_speech_result,
+            speech_timestamps=speech_timestamps,
+            speech_scan_coverage=speech_scan_coverage,
             transcription=transcription,
             keyframe_analysis=keyframe_analysis,
             suno_prompt=suno_prompt,
@@ -9,9 +9,15 @@ class KeyframeAnalysis(BaseModel):
     path: str
     description: str
 
+class SpeechTimestamp(BaseModel):
+    start: float
+    end: float
+
 class VideoProcessingResponse(BaseModel):
     message: str
     has_speech: bool
+    speech_timestamps: List[SpeechTimestamp] = []
+    speech_scan_coverage: float = 1.0  # < 1.0 when the speech probe stopped early or sampled the audio
     transcription: Optional[str] = None
     keyframe_analysis: List[KeyframeAnalysis]
     suno_prompt: str
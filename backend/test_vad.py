@@ -0,0 +1,207 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+torch = pytest.importorskip("torch")
+np = pytest.importorskip("numpy")
+pytest.importorskip("dotenv")
+
+from config import VAD_SAMPLE_RATE, VAD_WINDOW_SIZE
+from vad import VADBatcher, probe_audio, probs_to_timestamps
+
+
+class FakeVAD:
+    """Stateful stand-in for the Silero model: each row's probability depends on its own history."""
+
+    def __init__(self):
+        self.reset_states()
+
+    def reset_states(self):
+        self._state = None
+
+    def __call__(self, x, sr):
+        if self._state is None or self._state.shape[0] != x.shape[0]:
+            self._state = torch.zeros(x.shape[0])
+        self._state = 0.5 * self._state + x.abs().mean(dim=1)
+        return torch.sigmoid(10 * (self._state - 0.2)).unsqueeze(1)
+
+
+class FixedProbs:
+    """Model stub that replays a fixed probability sequence, one value per window."""
+
+    def __init__(self, probs):
+        self.probs = probs
+        self.reset_states()
+
+    def reset_states(self):
+        self._index = 0
+
+    def __call__(self, x, sr):
+        prob = self.probs[self._index]
+        self._index += 1
+        return torch.tensor([[prob]])
+
+
+class FakeAudioClip:
+    """Stand-in for a moviepy AudioFileClip read at 16 kHz; records which windows were read."""
+
+    def __init__(self, samples, reads=None):
+        self.samples = samples
+        self.duration = len(samples) / VAD_SAMPLE_RATE
+        self.reads = [] if reads is None else reads
+
+    def subclip(self, t0, t1):
+        self.reads.append((t0, t1))
+        return type(self)(self.samples[int(t0 * VAD_SAMPLE_RATE):int(t1 * VAD_SAMPLE_RATE)], self.reads)
+
+    def iter_chunks(self, fps, chunksize):
+        assert fps == VAD_SAMPLE_RATE
+        for offset in range(0, len(self.samples), chunksize):
+            yield self.samples[offset:offset + chunksize]
+
+
+def make_audio(seconds: float, speech, channels: int = 1) -> FakeAudioClip:
+    """Quiet audio, loud over each (start, end) in `speech`, shaped (n, channels) like moviepy."""
+    samples = np.full((int(seconds * VAD_SAMPLE_RATE), channels), 0.05, dtype=np.float32)
+    for start, end in speech:
+        samples[int(start * VAD_SAMPLE_RATE):int(end * VAD_SAMPLE_RATE)] = 0.9
+    return FakeAudioClip(samples)
+
+
+def make_clip(seconds: float, seed: int) -> torch.Tensor:
+    """Noise with loud bursts switched on and off every half second."""
+    generator = torch.Generator().manual_seed(seed)
+    num_samples = int(seconds * VAD_SAMPLE_RATE)
+    noise = torch.rand(num_samples, generator=generator) * 2 - 1
+    bursts = torch.rand(int(seconds * 2) + 1, generator=generator) > 0.5
+    envelope = bursts.repeat_interleave(VAD_SAMPLE_RATE // 2)[:num_samples].float() * 0.9 + 0.05
+    return noise * envelope
+
+
+def make_batcher() -> VADBatcher:
+    batcher = VADBatcher(max_wait_ms=50)
+    batcher.model = FakeVAD()
+    return batcher
+
+
+def test_batched_matches_unbatched():
+    # Lengths below, across and well past one segment, and not window-aligned
+    clips = [make_clip(seconds, seed) for seed, seconds in enumerate([3.0, 12.3, 25.0, 0.7])]
+    batcher = make_batcher()
+
+    expected = []
+    for clip in clips:
+        probs = []
+        for offset in range(0, len(clip), batcher.segment_samples):
+            probs.extend(batcher._infer([clip[offset:offset + batcher.segment_samples]])[0])
+        expected.append((probs, probs_to_timestamps(probs, len(clip))))
+
+    with ThreadPoolExecutor(len(clips)) as pool:
+        probs = list(pool.map(batcher.get_speech_probs, clips))
+        timestamps = list(pool.map(batcher.get_speech_timestamps, clips))
+
+    for (expected_probs, expected_timestamps), clip_probs, clip_timestamps in zip(expected, probs, timestamps):
+        assert clip_probs == pytest.approx(expected_probs, abs=1e-6)
+        assert clip_timestamps == expected_timestamps
+    assert any(timestamps)
+
+
+def test_segmented_matches_single_pass():
+    # Loud from 8 s to 13 s, across the first segment boundary (~9.98 s)
+    clip = torch.full((int(20 * VAD_SAMPLE_RATE),), 0.05)
+    clip[8 * VAD_SAMPLE_RATE:13 * VAD_SAMPLE_RATE] = 0.9
+    segmented = make_batcher()
+    single_pass = make_batcher()
+    single_pass.segment_samples = math.ceil(len(clip) / VAD_WINDOW_SIZE) * VAD_WINDOW_SIZE
+
+    timestamps = segmented.get_speech_timestamps(clip)
+    expected = single_pass.get_speech_timestamps(clip)
+
+    # Same speech segments, to within one model window
+    assert len(timestamps) == len(expected) == 1
+    window_s = VAD_WINDOW_SIZE / VAD_SAMPLE_RATE
+    assert timestamps[0]["start"] == pytest.approx(expected[0]["start"], abs=window_s)
+    assert timestamps[0]["end"] == pytest.approx(expected[0]["end"], abs=window_s)
+
+    # Probabilities only differ in the few windows after each boundary while state recovers
+    probs = segmented.get_speech_probs(clip)
+    expected_probs = single_pass.get_speech_probs(clip)
+    windows_per_segment = segmented.segment_samples // VAD_WINDOW_SIZE
+    settled = [i for i in range(len(probs)) if i % windows_per_segment >= 12]
+    assert [probs[i] for i in settled] == pytest.approx([expected_probs[i] for i in settled], abs=1e-3)
+
+
+def test_probs_to_timestamps_matches_silero():
+    silero_vad = pytest.importorskip("silero_vad")
+
+    probs = (
+        [0.1] * 10
+        + [0.9] * 20  # speech
+        + [0.2] * 2  # gap shorter than min_silence_duration_ms, bridged
+        + [0.8] * 15
+        + [0.4] * 5  # between neg_threshold and threshold, still speech
+        + [0.05] * 30
+        + [0.9] * 3  # blip shorter than min_speech_duration_ms, dropped
+        + [0.05] * 30
+        + [0.95] * 40  # runs to the end of the clip
+    )
+    num_samples = len(probs) * VAD_WINDOW_SIZE - 100
+
+    expected = silero_vad.get_speech_timestamps(
+        torch.zeros(num_samples), FixedProbs(probs), sampling_rate=VAD_SAMPLE_RATE
+    )
+    timestamps = probs_to_timestamps(probs, num_samples)
+
+    assert len(timestamps) == len(expected) == 2
+    for ts, silero_ts in zip(timestamps, expected):
+        assert ts["start"] == pytest.approx(silero_ts["start"] / VAD_SAMPLE_RATE, abs=1e-3)
+        assert ts["end"] == pytest.approx(silero_ts["end"] / VAD_SAMPLE_RATE, abs=1e-3)
+
+
+def test_probe_stops_after_first_confident_window():
+    audio = make_audio(20.0, [(6.0, 8.0), (15.0, 17.0)])
+
+    timestamps, coverage = probe_audio(audio, make_batcher(), window_s=5.0, min_speech_s=0.5)
+
+    assert audio.reads == [(0.0, 5.0), (5.0, 10.0)]
+    assert len(timestamps) == 1
+    assert timestamps[0]["start"] == pytest.approx(6.0, abs=0.1)
+    assert timestamps[0]["end"] == pytest.approx(8.0, abs=0.3)
+    assert coverage == pytest.approx(0.5)
+
+
+def test_probe_samples_long_audio():
+    audio = make_audio(100.0, [])
+
+    timestamps, coverage = probe_audio(
+        audio, make_batcher(), window_s=5.0, full_scan_s=60.0, coverage=0.25
+    )
+
+    # 20 windows, 5 sampled evenly: linspace(0, 19, 5) rounds to 0, 5, 10, 14, 19
+    assert [t0 for t0, _ in audio.reads] == [0.0, 25.0, 50.0, 70.0, 95.0]
+    assert timestamps == []
+    assert coverage == pytest.approx(0.25)
+
+
+def test_probe_merges_speech_across_window_edge():
+    audio = make_audio(10.0, [(4.0, 6.5)], channels=2)
+
+    # Neither half alone reaches min_speech_s; the merged segment does
+    timestamps, coverage = probe_audio(audio, make_batcher(), window_s=5.0, min_speech_s=2.0)
+
+    assert len(timestamps) == 1
+    assert timestamps[0]["start"] == pytest.approx(4.0, abs=0.1)
+    assert timestamps[0]["end"] == pytest.approx(6.5, abs=0.3)
+    assert coverage == pytest.approx(1.0)
+
+
+def test_probe_raises_if_nothing_was_scanned():
+    class BrokenAudioClip(FakeAudioClip):
+        def iter_chunks(self, fps, chunksize):
+            raise OSError("decode failed")
+
+    audio = BrokenAudioClip(np.zeros((VAD_SAMPLE_RATE * 10, 1), dtype=np.float32))
+
+    with pytest.raises(OSError):
+        probe_audio(audio, make_batcher(), window_s=5.0)
@@ -0,0 +1,308 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+from typing import Deque, List, Tuple, Union
+
+import numpy as np
+import torch
+
+from config import (
+    VAD_SAMPLE_RATE,
+    VAD_WINDOW_SIZE,
+    VAD_MAX_BATCH_SIZE,
+    VAD_SEGMENT_S,
+    VAD_MAX_WAIT_MS,
+    VAD_RESULT_TIMEOUT_S,
+    VAD_NUM_THREADS,
+    VAD_PROBE_WINDOW_S,
+    VAD_PROBE_MIN_SPEECH_S,
+    VAD_PROBE_FULL_SCAN_S,
+    VAD_PROBE_COVERAGE,
+)
+
+
+# Speech timestamps from per-window probabilities
+# Mirrors the segmentation in silero's get_speech_timestamps with its default
+# max_speech_duration_s=inf: long segments are never force-split, so the
+# max_speech_duration_s / min_silence_at_max_speech handling is left out.
+# Timestamps come back in seconds rounded to the millisecond.
+def probs_to_timestamps(
+    probs: List[float],
+    num_samples: int,
+    threshold: float = 0.5,
+    min_speech_duration_ms: int = 250,
+    min_silence_duration_ms: int = 100,
+    speech_pad_ms: int = 30,
+) -> List[dict]:
+    """Turn per-window speech probabilities into [{start, end}] segments in seconds."""
+    neg_threshold = max(threshold - 0.15, 0.01)
+    min_speech_samples = VAD_SAMPLE_RATE * min_speech_duration_ms / 1000
+    min_silence_samples = VAD_SAMPLE_RATE * min_silence_duration_ms / 1000
+    speech_pad_samples = int(VAD_SAMPLE_RATE * speech_pad_ms / 1000)
+
+    speeches: List[Tuple[int, int]] = []
+    triggered = False
+    start = 0
+    temp_end = 0
+
+    for i, prob in enumerate(probs):
+        position = i * VAD_WINDOW_SIZE
+
+        if prob >= threshold and temp_end:
+            temp_end = 0
+
+        if prob >= threshold and not triggered:
+            triggered = True
+            start = position
+            continue
+
+        if prob < neg_threshold and triggered:
+            if not temp_end:
+                temp_end = position
+            if position - temp_end < min_silence_samples:
+                continue
+            if temp_end - start > min_speech_samples:
+                speeches.append((start, temp_end))
+            triggered = False
+            temp_end = 0
+
+    if triggered and num_samples - start > min_speech_samples:
+        speeches.append((start, num_samples))
+
+    # Pad segments, splitting the gap when neighbours are closer than two pads
+    padded = []
+    for i, (start, end) in enumerate(speeches):
+        if i == 0:
+            start = max(0, start - speech_pad_samples)
+        if i < len(speeches) - 1:
+            gap = speeches[i + 1][0] - end
+            if gap < 2 * speech_pad_samples:
+                end += gap // 2
+                speeches[i + 1] = (max(0, speeches[i + 1][0] - gap // 2), speeches[i + 1][1])
+            else:
+                end = min(num_samples, end + speech_pad_samples)
+                speeches[i + 1] = (max(0, speeches[i + 1][0] - speech_pad_samples), speeches[i + 1][1])
+        else:
+            end = min(num_samples, end + speech_pad_samples)
+        padded.append({
+            "start": round(start / VAD_SAMPLE_RATE, 3),
+            "end": round(end / VAD_SAMPLE_RATE, 3),
+        })
+
+    return padded
+
+
+# Micro-batching VAD server
+class VADBatcher:
+    """Collects audio from concurrent requests and runs Silero VAD on them as one batch.
+
+    Callers block in `get_speech_timestamps` (they already run in worker threads via
+    asyncio.to_thread). Each clip is cut into fixed-length segments so that one long
+    clip can't pad out everyone else's rows, and every caller gets its own queue of
+    segments that batches are filled from round-robin, so a long full scan shares
+    each batch with newer callers instead of running ahead of them. A single
+    background thread owns the model, waits up to `max_wait_ms` for more segments
+    to arrive and then steps the whole batch through the model window by window.
+    Segments whose caller gave up (cancelled futures) are dropped. Per-window
+    probabilities are stitched back together per clip before segmentation. The
+    model state restarts at each segment boundary, so probabilities can dip for a
+    few windows there; speech across a boundary only stays one timestamp while
+    the dip stays above the negative threshold.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = VAD_MAX_BATCH_SIZE,
+        max_wait_ms: float = VAD_MAX_WAIT_MS,
+        segment_s: float = VAD_SEGMENT_S,
+        result_timeout_s: float = VAD_RESULT_TIMEOUT_S,
+        num_threads: int = VAD_NUM_THREADS,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.result_timeout_s = result_timeout_s
+        # Keep segments aligned to model windows so stitched probabilities line up
+        self.segment_samples = max(1, int(segment_s * VAD_SAMPLE_RATE) // VAD_WINDOW_SIZE) * VAD_WINDOW_SIZE
+        self.num_threads = num_threads
+        self.model = None
+        # One deque of pending (segment, future) pairs per caller
+        self._jobs: Deque[Deque[Tuple[torch.Tensor, Future]]] = deque()
+        self._jobs_changed = threading.Condition()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self):
+        """Load the model and start the batching thread (no-op if already running)."""
+        with self._lock:
+            if self._worker is not None:
+                return
+
+            # Process-wide: this also applies to every other torch user in the backend
+            torch.set_num_threads(self.num_threads)
+            try:
+                # Intra-op threads do the work; inter-op parallelism only adds contention here
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # Can only be set once per process, before any parallel work has started
+                pass
+
+            if self.model is None:
+                self.model, _ = torch.hub.load(repo_or_dir='snakers4/silero-vad', model='silero_vad')
+
+            self._worker = threading.Thread(target=self._run, name="vad-batcher", daemon=True)
+            self._worker.start()
+
+    def get_speech_timestamps(self, wav: Union[torch.Tensor, np.ndarray]) -> List[dict]:
+        """Queue a mono 16 kHz waveform and wait for its speech timestamps."""
+        wav = torch.as_tensor(wav, dtype=torch.float32).flatten()
+        return probs_to_timestamps(self.get_speech_probs(wav), len(wav))
+
+    def get_speech_probs(self, wav: torch.Tensor) -> List[float]:
+        """Queue a mono 16 kHz waveform and wait for its per-window speech probabilities."""
+        self.start()
+        if not self._worker.is_alive():
+            raise RuntimeError("VAD batcher thread is not running")
+
+        job = deque(
+            (wav[offset:offset + self.segment_samples], Future())
+            for offset in range(0, len(wav), self.segment_samples)
+        )
+        futures = [future for _, future in job]
+        if job:
+            with self._jobs_changed:
+                self._jobs.append(job)
+                self._jobs_changed.notify()
+
+        # Raises concurrent.futures.TimeoutError rather than hanging the caller's thread
+        deadline = time.monotonic() + self.result_timeout_s
+        probs = []
+        try:
+            for future in futures:
+                probs.extend(future.result(timeout=max(0, deadline - time.monotonic())))
+        except TimeoutError:
+            # Don't spend model time on segments nobody is waiting for
+            for future in futures:
+                future.cancel()
+            raise
+        return probs
+
+    def _collect_batch(self) -> List[Tuple[torch.Tensor, Future]]:
+        with self._jobs_changed:
+            while not self._jobs:
+                self._jobs_changed.wait()
+
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while sum(len(job) for job in self._jobs) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._jobs_changed.wait(remaining)
+
+            # Take one segment per caller per round so no single clip fills the batch
+            batch = []
+            while self._jobs and len(batch) < self.max_batch_size:
+                job = self._jobs.popleft()
+                segment, future = job.popleft()
+                if future.set_running_or_notify_cancel():
+                    batch.append((segment, future))
+                if job:
+                    self._jobs.append(job)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                results = self._infer([segment for segment, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    @torch.no_grad()
+    def _infer(self, segments: List[torch.Tensor]) -> List[List[float]]:
+        """Run segments (each at most `segment_samples` long) as one batch; returns per-window probabilities."""
+        num_windows = [math.ceil(len(segment) / VAD_WINDOW_SIZE) for segment in segments]
+        total_windows = max(num_windows)
+
+        # Zero-pad to the longest segment; rows are independent in the model state
+        padded = torch.zeros(len(segments), total_windows * VAD_WINDOW_SIZE)
+        for row, segment in enumerate(segments):
+            padded[row, :len(segment)] = segment
+
+        self.model.reset_states()
+        probs = torch.empty(len(segments), total_windows)
+        for i in range(total_windows):
+            chunk = padded[:, i * VAD_WINDOW_SIZE:(i + 1) * VAD_WINDOW_SIZE]
+            probs[:, i] = self.model(chunk, VAD_SAMPLE_RATE).flatten()
+
+        return [probs[row, :num_windows[row]].tolist() for row in range(len(segments))]
+
+
+vad_batcher = VADBatcher()
+
+
+# Early-exit speech probe
+def probe_audio(
+    audio,
+    batcher: VADBatcher = vad_batcher,
+    window_s: float = VAD_PROBE_WINDOW_S,
+    min_speech_s: float = VAD_PROBE_MIN_SPEECH_S,
+    full_scan_s: float = VAD_PROBE_FULL_SCAN_S,
+    coverage: float = VAD_PROBE_COVERAGE,
+) -> Tuple[List[dict], float]:
+    """Scan a moviepy audio clip (read at 16 kHz) in windows, stopping at the first confident speech segment.
+
+    Clips longer than `full_scan_s` only have `coverage` of their windows sampled,
+    spread evenly over the duration. Returns the timestamps found so far and the
+    fraction of the audio that was actually scanned. Errors before any window has
+    been scanned are raised rather than passed off as "no speech".
+    """
+    speech_timestamps = []
+    scanned_s = 0.0
+    duration = audio.duration
+
+    num_windows = math.ceil(duration / window_s)
+    windows = np.arange(num_windows)
+    if duration > full_scan_s:
+        num_sampled = max(1, math.ceil(num_windows * coverage))
+        windows = np.unique(np.linspace(0, num_windows - 1, num_sampled).round().astype(int))
+
+    try:
+        for window in windows:
+            t0 = window * window_s
+            t1 = min(duration, t0 + window_s)
+
+            # moviepy 1.0.3's to_soundarray stacks a generator for anything past its
+            # buffer (numpy >= 1.24 rejects that) and hstacks mono chunks side by side,
+            # so join the (n, nchannels) chunks end to end ourselves
+            samples = np.concatenate(list(audio.subclip(t0, t1).iter_chunks(fps=VAD_SAMPLE_RATE, chunksize=50000)))
+            samples = samples.reshape(len(samples), -1).mean(axis=1)
+
+            timestamps = [
+                {"start": round(t0 + ts["start"], 3), "end": round(t0 + ts["end"], 3)}
+                for ts in batcher.get_speech_timestamps(samples)
+            ]
+            scanned_s += t1 - t0
+
+            # VAD state is reset per window, so speech running across the edge with the
+            # previous (adjacent) window comes back as two pieces; stitch them together
+            if timestamps and speech_timestamps and speech_timestamps[-1]["end"] >= t0 and timestamps[0]["start"] <= t0:
+                speech_timestamps[-1]["end"] = timestamps.pop(0)["end"]
+            speech_timestamps.extend(timestamps)
+
+            if any(ts["end"] - ts["start"] >= min_speech_s for ts in speech_timestamps):
+                break
+
+    except Exception as e:
+        if not scanned_s:
+            raise
+        print(f"Error in speech probe: {str(e)}. Returning {len(speech_timestamps)} timestamps found so far")
+
+    return speech_timestamps, (min(1.0, scanned_s / duration) if duration else 0.0)